@@ -8,7 +8,76 @@ from scipy.signal import find_peaks, peak_widths
 import ipywidgets as widgets
 
 
-def get_peaks(second_deriv, threshold = 0.15): #, showplot = False):
+class PeakContext:
+    """
+    Class to share the peak finding results of one second derivative spline between pipeline stages.
+
+    The negated second derivative, the detected peaks and their widths are each computed on first use
+    and reused afterwards, so finding peaks and then anchor points (possibly several times while tuning
+    the adjustment factor) does not negate the signal or call peak_widths again.
+
+    Parameters:
+    - second_deriv: tuple
+        Tuple containing the results of the spline function, including x and y values.
+    - threshold: float, optional (default=0.15)
+        Threshold value used to determine the prominence of peaks.
+    - d2ydx2_spl_upsidedown: array-like, optional (default=None)
+        Negated second derivative values, computed from second_deriv if not given.
+    - peaks_index: array-like, optional (default=None)
+        Indices of already detected peaks, detected with find_peaks if not given.
+    """
+    def __init__(self, second_deriv, threshold = 0.15, d2ydx2_spl_upsidedown = None, peaks_index = None):
+        self.second_deriv = second_deriv
+        self.threshold = threshold
+        self.d2ydx2_spl_upsidedown = d2ydx2_spl_upsidedown
+        self.peaks_index = None
+        self.peak_properties = None
+        if peaks_index is not None:
+            self.peaks_index = np.asarray(peaks_index)
+            self.peak_properties = {}
+        self.peak_wid = None
+
+    def get_upsidedown_second_deriv(self):
+        if self.d2ydx2_spl_upsidedown is None:
+            self.d2ydx2_spl_upsidedown = np.negative(self.second_deriv[1])
+        return self.d2ydx2_spl_upsidedown
+
+    def get_peaks_index(self):
+        if self.peaks_index is None:
+            d2ydx2_spl_upsidedown = self.get_upsidedown_second_deriv()
+            relative_height = self.threshold * d2ydx2_spl_upsidedown.max()
+            self.peaks_index, self.peak_properties = find_peaks(d2ydx2_spl_upsidedown, prominence=relative_height)
+        return self.peaks_index
+
+    def get_peak_widths(self):
+        if self.peak_wid is None:
+            self.peak_wid = peak_widths(self.get_upsidedown_second_deriv(), self.get_peaks_index(), rel_height=1)
+        return self.peak_wid
+
+    def get_peaks(self):
+        """
+        Method to detect peaks in the second derivative, see get_peaks().
+        """
+        peaks_index = self.get_peaks_index()
+        #gather the coordinates of the peaks so we can plot them on the plot above
+        d2ydx2_peak_val = self.second_deriv[1][peaks_index]
+        deriv_x_peak_val = self.second_deriv[2][peaks_index]
+        return (peaks_index, self.peak_properties), deriv_x_peak_val, d2ydx2_peak_val
+
+    def get_start_end_anchorpoints(self):
+        """
+        Method to determine the start and end anchor points of peaks, see get_start_end_anchorpoints().
+        """
+        peak_wid = self.get_peak_widths()
+        #peak_widths returns fractional interpolated positions, truncate them to indices into the wavenumber array
+        width_endIdx = peak_wid[2].astype(np.intp)
+        width_startIdx = peak_wid[3].astype(np.intp)
+        wv_endIdx = self.second_deriv[2][width_endIdx]
+        wv_startIdx = self.second_deriv[2][width_startIdx]
+        return wv_startIdx, wv_endIdx
+
+
+def get_peaks(second_deriv, threshold = 0.15, d2ydx2_spl_upsidedown = None): #, showplot = False):
     """
     Function to detect peaks in the second derivative of a spline function.
 
@@ -19,33 +88,23 @@ def get_peaks(second_deriv, threshold = 0.15): #, showplot = False):
         Threshold value used to determine the prominence of peaks.
     - showplot: bool, optional (default=False)
         Flag to indicate whether to plot the detected peaks.
+    - d2ydx2_spl_upsidedown: array-like, optional (default=None)
+        Negated second derivative values, computed from second_deriv if not given.
 
     Returns:
     - peaks_index: array-like
         Indices of the detected peaks.
     - deriv_x_peak_val: array-like
         x-coordinate values(wavenumbers) of the detected peaks.
+    - d2ydx2_peak_val: array-like
+        Second derivative values at the detected peaks.
     """
-    d2ydx2_spl_upsidedown = second_deriv[1] * -1
-    relative_height = threshold * max(d2ydx2_spl_upsidedown)
-    peaks_index = find_peaks(d2ydx2_spl_upsidedown, prominence=relative_height)
-
-    #use for loops to extract the coordinates of the peaks so we can plot them on the plot above
-    d2ydx2_peak_val = []
-    deriv_x_peak_val = []
+    return PeakContext(second_deriv, threshold, d2ydx2_spl_upsidedown).get_peaks()
 
-    for i in peaks_index[0]:
-        d2ydx2_peak = second_deriv[1][i]
-        deriv_x_peak = second_deriv[2][i]
 
-        d2ydx2_peak_val.append(d2ydx2_peak)
-        deriv_x_peak_val.append(deriv_x_peak)
-    return peaks_index, deriv_x_peak_val, d2ydx2_peak_val
 
 
-
-
-def get_start_end_anchorpoints(peaks_index, second_deriv):
+def get_start_end_anchorpoints(peaks_index, second_deriv, d2ydx2_spl_upsidedown = None):
 
     """
     Function to determine the start and end anchor points of peaks.
@@ -55,28 +114,16 @@ def get_start_end_anchorpoints(peaks_index, second_deriv):
         Indices of the detected peaks.
     - second_deriv: tuple
         Second derivative of the spline function
+    - d2ydx2_spl_upsidedown: array-like, optional (default=None)
+        Negated second derivative values, computed from second_deriv if not given.
 
     Returns:
-    - wv_startIdx: list
+    - wv_startIdx: array-like
         x-coordinate values(wavenumber) of the start anchor points of peaks.
-    - wv_endIdx: list
+    - wv_endIdx: array-like
         x-coordinate values(wavenumber) of the end anchor points of peaks.
     """
-    d2ydx2_spl_upsidedown = second_deriv[1] * -1
-    peak_wid = peak_widths(d2ydx2_spl_upsidedown, peaks_index, rel_height=1) 
-
-    width_endIdx = [int(x) for x in peak_wid[2]]
-    wv_endIdx =[]
-
-    for i in width_endIdx:
-        wv_endIdx.append(second_deriv[2][i])
-
-    width_startIdx = [int(x) for x in peak_wid[3]]
-    wv_startIdx = []
-
-    for i in width_startIdx:
-        wv_startIdx.append(second_deriv[2][i])
-    return wv_startIdx, wv_endIdx
+    return PeakContext(second_deriv, d2ydx2_spl_upsidedown=d2ydx2_spl_upsidedown, peaks_index=peaks_index).get_start_end_anchorpoints()
 
 
 def get_all_anchor_points(wv_startIdx, wv_endIdx, deriv_x_peak_val, anchor_points_raw_data, y_corr_abs, adj_factor=1): 
@@ -102,37 +149,86 @@ def get_all_anchor_points(wv_startIdx, wv_endIdx, deriv_x_peak_val, anchor_point
         Flag to indicate whether to display the plot.
 
     Returns:
-    - anchor_data_sorted: DataFrame
-        DataFrame containing sorted anchor points data.
+    - anchor_data: DataFrame
+        DataFrame containing anchor points data in ascending wavenumber order.
     """
+    deriv_x_peak_val = np.asarray(deriv_x_peak_val)
+    #the raw spectra are monotonic, work on them in acending order so every lookup below can use np.searchsorted
+    anchor_points_raw_data, y_corr_abs, was_flipped = _ensure_ascending(anchor_points_raw_data, y_corr_abs)
     #get the smaller width for each peak using get_smaller_peak_width()
     smaller_peak_wid = get_smaller_peak_width(deriv_x_peak_val, wv_startIdx, wv_endIdx)
-    post_process_anchor_points = []
-    post_process_anchor_points_abs = []
-    """
-    Algorithm:
-        For each point in the raw data:
-            1. get the index of the peak that is closest to this point using the criteria minimum(abs(peak_wavenumber - raw_point))
-            2. if abs(closest peak - raw data point) > smaller peak width * adjustment factor:
-                        then append the raw data point as anchor point and its absorbance 
-    """
-
-    for index in range(len(anchor_points_raw_data)):
-        dist_peak_to_anchor = abs(deriv_x_peak_val-anchor_points_raw_data[index])
-        closest_peak_idx = np.argmin(dist_peak_to_anchor)
+    post_process_anchor_points, post_process_anchor_points_abs = filter_anchor_points(anchor_points_raw_data, y_corr_abs, deriv_x_peak_val, smaller_peak_wid, adj_factor)
 
-        if abs(deriv_x_peak_val[closest_peak_idx] - anchor_points_raw_data[index]) > smaller_peak_wid[closest_peak_idx]*adj_factor:
-                post_process_anchor_points.append(anchor_points_raw_data[index])
-                post_process_anchor_points_abs.append(y_corr_abs[index])
-
-    #post processesing to avoid repeating values and make sure the wavenumbers are in the same acending or decending order
-    post_process_anchor_data = pd.DataFrame({'wavenumber': post_process_anchor_points, 'absorbance': post_process_anchor_points_abs})
-    post_process_anchor_data = post_process_anchor_data.drop_duplicates()
-    anchor_data_sorted = post_process_anchor_data.sort_values(by='wavenumber').reset_index()
+    #post processesing to avoid repeating values, filtering keeps the acending order so no sort is needed
+    #repeated wavenumbers are adjacent, keep the first of each (prepending nan keeps the mask the same length, also when empty)
+    is_new_wavenumber = np.diff(post_process_anchor_points, prepend=np.nan) != 0
+    #index is the position of each anchor point in the order of the raw spectra
+    anchor_idx = np.arange(post_process_anchor_points.size)
+    if was_flipped:
+        anchor_idx = anchor_idx[::-1]
+    anchor_data = pd.DataFrame({'index': anchor_idx[is_new_wavenumber], 'wavenumber': post_process_anchor_points[is_new_wavenumber], 'absorbance': post_process_anchor_points_abs[is_new_wavenumber]})
 
     #get all peak wavenumber and absorbance for plotting
     peak_wavenumber, peak_absorbance = get_peaks_absorbance(deriv_x_peak_val, anchor_points_raw_data, y_corr_abs)
-    return anchor_data_sorted, peak_wavenumber, peak_absorbance
+    return anchor_data, peak_wavenumber, peak_absorbance
+
+
+def filter_anchor_points(anchor_points_raw_data, y_corr_abs, deriv_x_peak_val, smaller_peak_wid, adj_factor=1):
+    """
+    Function to keep the raw data points that lie outside the smaller width of their closest peak.
+
+    Parameters:
+    - anchor_points_raw_data: ndarray
+        Raw spectra data.
+    - y_corr_abs: ndarray
+        Corresponding absorbance values.
+    - deriv_x_peak_val: ndarray
+        x-coordinate values(wavenumber) of the detected peaks.
+    - smaller_peak_wid: ndarray
+        Smaller peak width for each peak, in the same order as deriv_x_peak_val.
+    - adj_factor: float, optional (default=1)
+        Adjustment factor for filtering anchor points.
+
+    Returns:
+    - post_process_anchor_points: ndarray
+        Wavenumbers of the kept raw data points, in their original order.
+    - post_process_anchor_points_abs: ndarray
+        Absorbance of the kept raw data points.
+
+    Algorithm:
+        For all points in the raw data at once:
+            1. get the index of the peak that is closest to each point using the criteria minimum(abs(peak_wavenumber - raw_point))
+            2. keep the raw data points where abs(closest peak - raw data point) > smaller peak width * adjustment factor,
+               along with their absorbance
+    """
+    raw_wavenumber = np.asarray(anchor_points_raw_data)
+    peaks = np.asarray(deriv_x_peak_val)
+    peak_wid = np.asarray(smaller_peak_wid)
+
+    #peaks come from a 1D signal, so once sorted the closest peak to each raw data point is one of its
+    #two neighbours in the sorted peak array; no need to build the full raw data x peaks distance matrix
+    peak_order = np.argsort(peaks)
+    sorted_peaks = peaks[peak_order]
+    #scale the widths once per peak rather than once per raw data point
+    sorted_threshold = peak_wid[peak_order]*adj_factor
+    pos = np.searchsorted(sorted_peaks, raw_wavenumber)
+    left = np.clip(pos - 1, 0, sorted_peaks.size - 1)
+    right = np.clip(pos, 0, sorted_peaks.size - 1)
+    left_dist = np.subtract(raw_wavenumber, sorted_peaks[left])
+    np.abs(left_dist, out=left_dist)
+    right_dist = np.subtract(sorted_peaks[right], raw_wavenumber)
+    np.abs(right_dist, out=right_dist)
+    #one comparison picks both the closest peak and its distance, left_dist is reused to hold the minimum;
+    #on equal distances the peak listed first in deriv_x_peak_val wins, as np.argmin over the peaks would pick
+    use_right = (right_dist < left_dist) | ((right_dist == left_dist) & (peak_order[right] < peak_order[left]))
+    closest_peak_idx = np.where(use_right, right, left)
+    #same use_right mask as the index choice, so a tie resolved to the first-listed peak also takes that peak's distance
+    np.copyto(left_dist, right_dist, where=use_right)
+    keep = left_dist > sorted_threshold[closest_peak_idx]
+
+    post_process_anchor_points = anchor_points_raw_data[keep]
+    post_process_anchor_points_abs = y_corr_abs[keep]
+    return post_process_anchor_points, post_process_anchor_points_abs
 
 
 def get_peaks_absorbance(deriv_x_peak_val,x_wavenb, y_corr_abs):
@@ -149,23 +245,23 @@ def get_peaks_absorbance(deriv_x_peak_val,x_wavenb, y_corr_abs):
         Corresponding absorbance values of raw spectra.
 
     Returns:
-    - peak_wavenumber: list
+    - peak_wavenumber: array-like
         Wavenumber values corresponding to the peaks.
-    - peak_absorbance: list
+    - peak_absorbance: array-like
         Absorbance values corresponding to the peaks.
     """
     # Define the range
     range_width = 2
-    peak_wavenumber = []
-    peak_absorbance = []
-
-    for peak_val in deriv_x_peak_val:
-        indices_within_threshold = [index for index, value in enumerate(x_wavenb) if abs(value - peak_val) <= range_width]
-        data = pd.DataFrame({'wv': x_wavenb[indices_within_threshold], 'abs': y_corr_abs[indices_within_threshold]}) 
-        #Choosing the highest wavenumber as the peak
-        peak_data = data.loc[data['wv'].idxmax()]
-        peak_wavenumber.append(peak_data['wv'])
-        peak_absorbance.append(peak_data['abs'])
+    x_wavenb, y_corr_abs, _ = _ensure_ascending(x_wavenb, y_corr_abs)
+    deriv_x_peak_val = np.asarray(deriv_x_peak_val)
+
+    #Choosing the highest wavenumber within range_width of each peak as the peak
+    highest_idx = np.searchsorted(x_wavenb, deriv_x_peak_val + range_width, side='right') - 1
+    if np.any(highest_idx < 0) or np.any(abs(x_wavenb[highest_idx] - deriv_x_peak_val) > range_width):
+        raise ValueError(f"No raw data wavenumber found within {range_width} of every peak")
+
+    peak_wavenumber = x_wavenb[highest_idx]
+    peak_absorbance = y_corr_abs[highest_idx]
     return peak_wavenumber, peak_absorbance
 
 
@@ -182,18 +278,46 @@ def get_smaller_peak_width(deriv_x_peak_val, wv_startIdx, wv_endIdx):
         x-coordinate values (wavenumber) of the end anchor points of peaks.
 
     Returns:
-    - smaller_peak_wid: list
+    - smaller_peak_wid: ndarray
         Smaller peak width for each peak.
     """
-    smaller_peak_wid = []
-    for i in range(len(deriv_x_peak_val)):
-        left_wid = deriv_x_peak_val[i] - wv_startIdx[i]
-        right_wid = wv_endIdx[i] - deriv_x_peak_val[i]
-        #smaller peak width
-        smaller_peak_wid.append(min(left_wid, right_wid))
+    #contiguous inputs so np.minimum runs its SIMD loop; the caller's precision is kept, filter_anchor_points casts for itself
+    deriv_x_peak_val = np.ascontiguousarray(deriv_x_peak_val)
+    left_wid = deriv_x_peak_val - np.ascontiguousarray(wv_startIdx)
+    right_wid = np.ascontiguousarray(wv_endIdx) - deriv_x_peak_val
+    #smaller peak width
+    smaller_peak_wid = np.minimum(left_wid, right_wid)
     return smaller_peak_wid
 
 
+def _ensure_ascending(x, y):
+    """
+    Function to put monotonic spectra data in ascending wavenumber order.
+
+    Parameters:
+    - x: array-like
+        Monotonic wavenumber values.
+    - y: array-like
+        Corresponding absorbance values.
+
+    Returns:
+    - x: ndarray
+        Wavenumber values in ascending order.
+    - y: ndarray
+        Corresponding absorbance values, in the same order as x.
+    - was_flipped: bool
+        True if the input was descending and has been reversed.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    #monotonic data, comparing the ends is enough to know the direction
+    was_flipped = bool(x.size > 1 and x[0] > x[-1])
+    if was_flipped:
+        x = x[::-1]
+        y = y[::-1]
+    return x, y, was_flipped
+
+
 def get_peak_wid_at_half_height(baseline_corrected_abs, peak_wv_index):
     peak_wid = peak_widths(baseline_corrected_abs, peak_wv_index, rel_height=0.5) 
     return peak_wid[0]
@@ -1,7 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from scipy.interpolate import UnivariateSpline
+from scipy.interpolate import UnivariateSpline, make_interp_spline
 from scipy.signal import find_peaks
 from hydrogenase_processing.second_deriv import flip_order
 
@@ -11,7 +11,7 @@ def baseline_spline(anchor_points, degree=3, smooth=0):
 
     Parameters:
     - anchor_points: DataFrame
-        DataFrame containing anchor points with 'wavenumber' and 'absorbance' columns.
+        DataFrame containing anchor points with 'wavenumber' and 'absorbance' columns, sorted by ascending wavenumber.
     - degree: int, optional (default=3)
         Degree of the spline interpolation.
     - smooth: float, optional (default=0)
@@ -21,9 +21,18 @@ def baseline_spline(anchor_points, degree=3, smooth=0):
     - baseline_curve: DataFrame
         DataFrame containing the fitted baseline curve with 'wavenumber' and 'absorbance' columns.
     """
-    spline_fit = UnivariateSpline(anchor_points['wavenumber'], anchor_points['absorbance'],k = degree, s=smooth)
-    x_range = np.linspace(int(min(anchor_points['wavenumber'])), int(max(anchor_points['wavenumber'])), 1000)
+    #anchor points come sorted by ascending wavenumber from get_all_anchor_points, as both spline fits require
+    anchor_wavenumber = anchor_points['wavenumber'].to_numpy()
+    anchor_absorbance = anchor_points['absorbance'].to_numpy()
+    if smooth == 0:
+        #interpolating spline, skips the FITPACK smoothing/knot selection that UnivariateSpline runs even with s=0
+        spline_fit = make_interp_spline(anchor_wavenumber, anchor_absorbance, k=degree)
+    else:
+        spline_fit = UnivariateSpline(anchor_wavenumber, anchor_absorbance, k = degree, s=smooth)
+    #sorted input, so the range ends are the first and last anchor points
+    x_range = np.linspace(int(anchor_wavenumber[0]), int(anchor_wavenumber[-1]), 1000)
     #x_range = anchor_points['wavenumber']
+    #x_range is sorted, so the spline evaluation walks the knot intervals in one sweep
     baseline_fit = spline_fit(x_range)
     baseline_curve = pd.DataFrame({'wavenumber':x_range, 'absorbance': baseline_fit})
     return baseline_curve
@@ -48,7 +57,7 @@ def raw_spline(raw_wavenumber, raw_absorbance, degree=3, smooth=0):
         DataFrame containing the fitted baseline curve with 'wavenumber' and 'absorbance' columns.
     """
     raw_spline_fit = UnivariateSpline(flip_order(raw_wavenumber), flip_order(raw_absorbance),k=degree, s=smooth)
-    raw_x_range = np.linspace(int(min(raw_wavenumber)), int(max(raw_wavenumber)), 1000)
+    raw_x_range = np.linspace(int(np.min(raw_wavenumber)), int(np.max(raw_wavenumber)), 1000)
     raw_fit = raw_spline_fit(raw_x_range)
     return [raw_x_range, raw_fit]
 
@@ -61,30 +70,38 @@ def baseline_correction(baseline_points, raw_wavenumber, raw_absorbance):
     Perform baseline correction on raw absorbance data using baseline points.
 
     Args:
-    - baseline_points (DataFrame): DataFrame containing baseline wavenumber and absorbance values.
+    - baseline_points (DataFrame): DataFrame containing baseline wavenumber and absorbance values, with monotonic
+      (ascending or descending) wavenumbers.
     - raw_wavenumber (array): List of wavenumber values from raw data.
     - raw_absorbance (array): List of absorbance values from raw data.
 
     Returns:
-    - baseline_corrected_abs (list): List of baseline-corrected absorbance values.
+    - baseline_corrected_abs (array): Array of baseline-corrected absorbance values.
     """
-    baseline_corrected_abs = []
-    for idx, wv_num in enumerate(raw_wavenumber): #iterate through each data point in raw data
-        #subtract the wv_num from the baseline[wavenumber] and take absolute of the diff and sort it and get the
-        #idx of the point from the baseline that is closest to the raw datapoint
-        diff_array = abs(baseline_points['wavenumber'] - wv_num)
-        #this is the index of the closest wavenumber in the baseline curve to that of the datapoint
-        closest_wv_num = diff_array.idxmin()
-        #Now subtract the baseline absornace from the raw data absorbance
-        raw_minus_baseline = raw_absorbance[idx] - baseline_points.loc[closest_wv_num, 'absorbance']
-
-        if raw_minus_baseline <0:
-            #if the difference is negative, then baseline point is higher than raw absorbance which is not possible. Hence appending 0 at those points
-            baseline_corrected_abs.append(0)
-        else:
-            baseline_corrected_abs.append(raw_minus_baseline)
-
-            
+    raw_wavenumber = np.asarray(raw_wavenumber)
+    raw_absorbance = np.asarray(raw_absorbance)
+    #the baseline curve is monotonic (baseline_spline evaluates it on an ascending grid), so the closest baseline point to
+    #each raw datapoint is one of its two neighbours found with searchsorted; descending curves are searched reversed
+    baseline_wavenumber = baseline_points['wavenumber'].to_numpy()
+    baseline_absorbance = baseline_points['absorbance'].to_numpy()
+    descending = baseline_wavenumber.size > 1 and baseline_wavenumber[0] > baseline_wavenumber[-1]
+    if descending:
+        baseline_wavenumber = baseline_wavenumber[::-1]
+        baseline_absorbance = baseline_absorbance[::-1]
+    pos = np.searchsorted(baseline_wavenumber, raw_wavenumber)
+    left = np.clip(pos - 1, 0, baseline_wavenumber.size - 1)
+    right = np.clip(pos, 0, baseline_wavenumber.size - 1)
+    left_dist = abs(raw_wavenumber - baseline_wavenumber[left])
+    right_dist = abs(baseline_wavenumber[right] - raw_wavenumber)
+    #on equal distances keep the baseline point that comes first in baseline_points, as idxmin would
+    left_closer = left_dist < right_dist if descending else left_dist <= right_dist
+    closest_wv_num = np.where(left_closer, left, right)
+
+    #Now subtract the baseline absornace from the raw data absorbance
+    baseline_corrected_abs = raw_absorbance - baseline_absorbance[closest_wv_num]
+    #if the difference is negative, then baseline point is higher than raw absorbance which is not possible. Hence setting 0 at those points
+    is_negative = baseline_corrected_abs < 0
+    baseline_corrected_abs[is_negative] = 0
     return baseline_corrected_abs
 
 
@@ -94,7 +111,8 @@ def get_baseline_peak_index(baseline_corrected_abs, rawdata_wavenumber, raw_data
     peak_index_baseline = find_peaks(baseline_corrected_abs)
     #print('peak index baseline', peak_index_baseline)
     #get the corresponding wavenumbers present at the peak_index
-    baseline_peak_wv = [[rawdata_wavenumber[i], i] for i in peak_index_baseline[0]]
+    baseline_peak_idx = peak_index_baseline[0]
+    baseline_peak_wv = np.asarray(rawdata_wavenumber)[baseline_peak_idx]
     #print('baseline_peak_wv', baseline_peak_wv)
     #Now obtain the corresponding peak wavenumbers using raw_data_peak_wv as reference. This was found using the 
     #raw spectra data
@@ -104,6 +122,8 @@ def get_baseline_peak_index(baseline_corrected_abs, rawdata_wavenumber, raw_data
     
     peak_wv_baseline =[]
     peak_idx_baseline =[]
+    #marks the baseline peaks already added to peak_wv_baseline
+    is_selected = np.zeros(baseline_peak_wv.size, dtype=bool)
     #use the raw data peak wv as the standard of when to stop
     while len(peak_wv_baseline) < len(raw_data_peak_wv):
         #print(f'baseline peak wv{peak_wv_baseline}, raw peak wv {raw_data_peak_wv}')
@@ -112,19 +132,22 @@ def get_baseline_peak_index(baseline_corrected_abs, rawdata_wavenumber, raw_data
         if range_val > 1000:
             break
         for raw_wv in raw_data_peak_wv:
-            for wv in baseline_peak_wv:
-                if abs(wv[0] - raw_wv) <= range_val and wv[0] not in peak_wv_baseline:
-                    peak_wv_baseline.append(wv[0])
-                    peak_idx_baseline.append(wv[1])
+            #baseline peaks within range of this raw peak that were not added yet, in one pass over the array
+            within_range = np.flatnonzero((np.abs(baseline_peak_wv - raw_wv) <= range_val) & ~is_selected)
+            is_selected[within_range] = True
+            peak_wv_baseline.extend(baseline_peak_wv[within_range].tolist())
+            peak_idx_baseline.extend(baseline_peak_idx[within_range].tolist())
                 
     
     #cleaning the peak_wv_baseline list, such that the peaks with negligible abs are deleted
     #print(len(baseline_corrected_abs), baseline_corrected_abs[491])
+    #the cut off does not change while cleaning, compute it once
+    negligible_abs = np.max(baseline_corrected_abs)*0.01
     i=0
     while i < len(peak_wv_baseline):
         #print('i',i, 'len of var', len(peak_idx_baseline))
         idx = peak_idx_baseline[i]
-        if baseline_corrected_abs[idx] < max(baseline_corrected_abs)*0.01:
+        if baseline_corrected_abs[idx] < negligible_abs:
             peak_idx_baseline.remove(peak_idx_baseline[i])
             peak_wv_baseline.remove(peak_wv_baseline[i])
             i=0
@@ -6,21 +6,37 @@ import matplotlib.pyplot as plt
 def gaussian(x, *params):
 
     y = np.zeros_like(x)
+    #scratch buffer reused by every peak, curve_fit calls this many times so avoid allocating temporaries per term
+    term = np.empty_like(y)
 
     for i in range(0, len(params), 3):
         amplitude = params[i]
         center = params[i+1]
         sigma = params[i+2]
-        y += amplitude*(1/(sigma* np.sqrt(2*np.pi)))*np.exp((-1/2)*((x - center)/ sigma)**2) 
+        #amplitude*(1/(sigma* np.sqrt(2*np.pi)))*np.exp((-1/2)*((x - center)/ sigma)**2)
+        np.subtract(x, center, out=term)
+        term /= sigma
+        np.square(term, out=term)
+        term *= -1/2
+        np.exp(term, out=term)
+        term *= amplitude*(1/(sigma* np.sqrt(2*np.pi)))
+        y += term
     return y
 
 def lorentzian(x, *params):
     y = np.zeros_like(x)
+    #scratch buffer reused by every peak, see gaussian()
+    term = np.empty_like(y)
     for i in range(0, len(params), 3):
         amplitude = params[i]
         center = params[i+1]
         sigma = params[i+2]
-        y += amplitude*sigma**2/((x-center)**2+sigma**2)
+        #amplitude*sigma**2/((x-center)**2+sigma**2)
+        np.subtract(x, center, out=term)
+        np.square(term, out=term)
+        term += sigma**2
+        np.divide(amplitude*sigma**2, term, out=term)
+        y += term
     return y
 
 
@@ -1,6 +1,6 @@
 from hydrogenase_processing.cut_range import cut_range_subtraction_multiple_wv
 from hydrogenase_processing.second_deriv import second_deriv
-from hydrogenase_processing.anchor_points import get_peaks,get_start_end_anchorpoints,get_all_anchor_points, get_peaks_absorbance, get_peak_wid_at_half_height
+from hydrogenase_processing.anchor_points import PeakContext, get_all_anchor_points, get_peaks_absorbance, get_peak_wid_at_half_height
 from hydrogenase_processing.baseline import baseline_spline, raw_spline, baseline_correction,get_baseline_peak_index, plot_baseline_corrected_data
 from hydrogenase_processing.peak_fit import peak_fit
 import os
@@ -34,6 +34,7 @@ class ProSpecPy: #class object running to organize script from the src directory
         #2nd derivative
         self.second_deriv_dict = {}
         self.second_deriv_peak_dict = {}
+        self.peak_context = None
 
         #anchor points
         self.anchor_points = None
@@ -172,7 +173,9 @@ class ProSpecPy: #class object running to organize script from the src directory
     #Section 4: second derivative peak selection via threshold/peak heights
     def peak_finder(self, threshold):
         self.threshold = threshold
-        self.peak_information, peak_wavenumber, peak_seconderiv_absorbance = get_peaks(self.get_second_deriv_tuple(), self.threshold)
+        #shares the negated second derivative and peak widths with anchor_point_fit
+        self.peak_context = PeakContext(self.get_second_deriv_tuple(), self.threshold)
+        self.peak_information, peak_wavenumber, peak_seconderiv_absorbance = self.get_peak_context().get_peaks()
         peak_index = self.peak_information[0]
         self.second_deriv_peak_dict['peak_index'] = peak_index
         self.second_deriv_peak_dict['peak_wavenumber'] = peak_wavenumber
@@ -183,6 +186,9 @@ class ProSpecPy: #class object running to organize script from the src directory
     
     def get_peak_index(self):
         return self.second_deriv_peak_dict['peak_index']
+
+    def get_peak_context(self):
+        return self.peak_context # defined in peak_finder()
     
     #not yet finished method 9/3/24
     def save_second_deriv_peak_plot(self):
@@ -195,7 +201,7 @@ class ProSpecPy: #class object running to organize script from the src directory
 
     #Section 5: anchor point post processing
     def anchor_point_fit(self, adjustment_factor):
-        wv_startIdx, wv_endIdx = get_start_end_anchorpoints(self.get_peak_index(), self.get_second_deriv_tuple())
+        wv_startIdx, wv_endIdx = self.get_peak_context().get_start_end_anchorpoints()
         anchor_points, peak_wavenumber,peak_absorbance = get_all_anchor_points(wv_startIdx, wv_endIdx, self.second_deriv_peak_dict['peak_wavenumber'], self.get_subtracted_spectra_wavenumber(), self.get_subtracted_spectra_absorbance(), adjustment_factor)
         self.anchor_points = anchor_points
         self.anchor_points_peak_dict['peak_wavenumber'] = peak_wavenumber
@@ -220,17 +226,19 @@ class ProSpecPy: #class object running to organize script from the src directory
 
         if self.baseline_curve is not None:
             #use spline results for subtraction to avoid discreet subtraction results, using spline results to subtract each other
-            self.baseline_corrected_abs = baseline_correction(self.get_baseline_curve(), raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[0], raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[1])
-            peak_wv, peak_abs = get_peaks_absorbance(self.second_deriv_peak_dict['peak_wavenumber'], raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[0], raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[1])
+            #fit the raw spline once and reuse it for the subtraction, peak lookup and plotting below
+            raw_spline_wavenumber, raw_spline_absorbance = raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())
+            self.baseline_corrected_abs = baseline_correction(self.get_baseline_curve(), raw_spline_wavenumber, raw_spline_absorbance)
+            peak_wv, peak_abs = get_peaks_absorbance(self.second_deriv_peak_dict['peak_wavenumber'], raw_spline_wavenumber, raw_spline_absorbance)
             #print('peak_wv', peak_wv)
-            peak_wv_index, peak_wv_baseline, peak_baseline_abs = get_baseline_peak_index(self.baseline_corrected_abs, raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[0], peak_wv)#self.get_subtracted_spectra_wavenumber(), peak_wv) 
+            peak_wv_index, peak_wv_baseline, peak_baseline_abs = get_baseline_peak_index(self.baseline_corrected_abs, raw_spline_wavenumber, peak_wv)#self.get_subtracted_spectra_wavenumber(), peak_wv) 
             #print('peak wv baseline', peak_wv_baseline)
             self.peak_width_half_height = get_peak_wid_at_half_height(self.baseline_corrected_abs,peak_wv_index) #need to verify if its giving the widths in order of peaks before saving TO DO!
             #print(self.peak_width_half_height)
             self.baseline_corrected_peak_dict['peak_index'] = peak_wv_index
             self.baseline_corrected_peak_dict['wavenumber'] = peak_wv_baseline
             self.baseline_corrected_peak_dict['absorbance'] = peak_baseline_abs
-            baseline_corrected_fig = plot_baseline_corrected_data(raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[0], self.baseline_corrected_abs, peak_wv_baseline, peak_baseline_abs, self.sample_name, self.batch_id, showplot)
+            baseline_corrected_fig = plot_baseline_corrected_data(raw_spline_wavenumber, self.baseline_corrected_abs, peak_wv_baseline, peak_baseline_abs, self.sample_name, self.batch_id, showplot)
             if save:
                 filename = 'baseline_subtracted_spectra'
                 self.save_plot(baseline_corrected_fig,filename, verbose=verbose)
@@ -238,7 +246,7 @@ class ProSpecPy: #class object running to organize script from the src directory
                     #print(f"Baseline subtracted_spectra plot saved to {os.path.join(self.output_folder, filename)}")
 
                 data_df = pd.DataFrame({
-                    'wavenumber': raw_spline(self.get_subtracted_spectra_wavenumber(),self.get_subtracted_spectra_absorbance())[0],
+                    'wavenumber': raw_spline_wavenumber,
                     'absorbance': self.baseline_corrected_abs
                 })
                 csv_filename = 'baseline_corrected_data.csv'
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from hydrogenase_processing.anchor_points import filter_anchor_points, get_all_anchor_points, get_smaller_peak_width
+
+
+def test_filter_anchor_points_tie_goes_to_first_listed_peak():
+    # descending peaks, as produced from descending OPUS wavenumbers; 2005 is equally far from both
+    raw = np.array([2005.])
+    absorbance = np.array([0.5])
+    wavenumber, _ = filter_anchor_points(raw, absorbance, np.array([2010., 2000.]), np.array([1., 6.]))
+    # closest peak is 2010 (listed first), its width 1 < 5 so the point is kept
+    assert wavenumber.tolist() == [2005.]
+
+    # ascending order of the same peaks, 2000 is listed first and its width 6 > 5 drops the point
+    wavenumber, _ = filter_anchor_points(raw, absorbance, np.array([2000., 2010.]), np.array([6., 1.]))
+    assert wavenumber.size == 0
+
+
+def test_filter_anchor_points_matches_argmin_for_descending_peaks():
+    rng = np.random.default_rng(0)
+    raw = np.arange(1800., 2200., 0.5)
+    absorbance = rng.random(raw.size)
+    peaks = np.array([2150., 2100., 2050., 2000., 1950.])
+    widths = np.array([3., 25., 10., 25., 4.])
+
+    # reference: the original per-point loop using np.argmin over the peaks in their given order
+    expected = []
+    for point in raw:
+        closest = np.argmin(np.abs(peaks - point))
+        if abs(peaks[closest] - point) > widths[closest]:
+            expected.append(point)
+
+    wavenumber, _ = filter_anchor_points(raw, absorbance, peaks, widths)
+    assert wavenumber.tolist() == expected
+
+
+def test_filter_anchor_points_scales_widths_by_adj_factor():
+    raw = np.array([2012., 2007., 2005., 1996., 1990.])
+    absorbance = np.arange(raw.size, dtype=float)
+    peaks = np.array([2010., 2000.])
+    widths = np.array([1., 3.])
+
+    # distances 2, 3, 5 (tie, first-listed 2010 wins), 4, 10; thresholds 2 for 2010 and 6 for 2000
+    wavenumber, kept_absorbance = filter_anchor_points(raw, absorbance, peaks, widths, adj_factor=2)
+    assert wavenumber.tolist() == [2007., 2005., 1990.]
+    assert kept_absorbance.tolist() == [1., 2., 4.]
+
+
+def test_get_smaller_peak_width_keeps_input_precision():
+    peaks = np.array([2100.123456789, 2000.987654321])
+    widths = get_smaller_peak_width(peaks, peaks - np.array([3.000000001, 1.5]), peaks + np.array([4., 1.000000002]))
+    assert widths.dtype == np.float64
+    np.testing.assert_allclose(widths, [3.000000001, 1.000000002], rtol=0, atol=1e-9)
+
+
+def test_filter_anchor_points_grid_aligned_boundaries_match_float64():
+    # raw points, peaks and peak edges all on the same spline grid, so many distances equal a width up to float64 rounding
+    grid = np.linspace(2150, 1850, 1000)
+    raw = grid.copy()
+    absorbance = np.zeros(raw.size)
+    peak_idx = np.array([40, 180, 333, 500, 610, 870])
+    peaks = grid[peak_idx]
+    widths = get_smaller_peak_width(peaks, grid[peak_idx + 7], grid[peak_idx - 12])
+
+    for adj_factor in (0.5, 1, 2):
+        expected = []
+        for point in raw:
+            closest = np.argmin(np.abs(peaks - point))
+            if abs(peaks[closest] - point) > widths[closest]*adj_factor:
+                expected.append(point)
+        wavenumber, _ = filter_anchor_points(raw, absorbance, peaks, widths, adj_factor)
+        assert wavenumber.tolist() == expected
+
+
+def reference_anchor_data(wv_startIdx, wv_endIdx, deriv_x_peak_val, anchor_points_raw_data, y_corr_abs, adj_factor=1):
+    # the original get_all_anchor_points: per-point argmin loop, then drop_duplicates, sort_values and reset_index
+    smaller_peak_wid = [min(peak - start, end - peak) for peak, start, end in zip(deriv_x_peak_val, wv_startIdx, wv_endIdx)]
+    deriv_x_peak_val = np.asarray(deriv_x_peak_val)
+    anchor_points, anchor_points_abs = [], []
+    for index in range(len(anchor_points_raw_data)):
+        closest_peak_idx = np.argmin(abs(deriv_x_peak_val - anchor_points_raw_data[index]))
+        if abs(deriv_x_peak_val[closest_peak_idx] - anchor_points_raw_data[index]) > smaller_peak_wid[closest_peak_idx]*adj_factor:
+            anchor_points.append(anchor_points_raw_data[index])
+            anchor_points_abs.append(y_corr_abs[index])
+    anchor_data = pd.DataFrame({'wavenumber': anchor_points, 'absorbance': anchor_points_abs}).drop_duplicates()
+    return anchor_data.sort_values(by='wavenumber').reset_index()
+
+
+def test_get_all_anchor_points_matches_reference():
+    rng = np.random.default_rng(1)
+    raw_ascending = np.arange(1900., 2100., 0.5)
+    absorbance_ascending = rng.random(raw_ascending.size)
+    # descending peaks as the pipeline produces them, start below and end above each peak
+    peaks = np.array([2060., 2003.5, 1951.])
+    wv_startIdx = peaks - np.array([4., 12., 2.5])
+    wv_endIdx = peaks + np.array([6., 3., 9.])
+
+    for raw, absorbance in ((raw_ascending, absorbance_ascending), (raw_ascending[::-1], absorbance_ascending[::-1])):
+        for adj_factor in (1, 2.5):
+            anchor_data = get_all_anchor_points(wv_startIdx, wv_endIdx, peaks, raw, absorbance, adj_factor)[0]
+            expected = reference_anchor_data(wv_startIdx, wv_endIdx, peaks, raw, absorbance, adj_factor)
+            assert len(expected) > 0
+            pd.testing.assert_frame_equal(anchor_data, expected, check_dtype=False, check_index_type=False)
+
+
+def test_get_all_anchor_points_empty_result():
+    args = ([1990.], [2020.], [2005.], np.arange(2000., 2010.), np.ones(10))
+    anchor_data = get_all_anchor_points(*args)[0]
+    expected = reference_anchor_data(*args)
+    assert anchor_data.empty
+    assert list(anchor_data.columns) == ['index', 'wavenumber', 'absorbance']
+    pd.testing.assert_frame_equal(anchor_data, expected, check_dtype=False, check_index_type=False)
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from hydrogenase_processing.baseline import baseline_correction
+
+
+def reference_baseline_correction(baseline_points, raw_wavenumber, raw_absorbance):
+    # the original per-point loop: closest baseline point by idxmin, negative differences set to 0
+    corrected = []
+    for idx, wv_num in enumerate(raw_wavenumber):
+        closest_wv_num = abs(baseline_points['wavenumber'] - wv_num).idxmin()
+        corrected.append(max(raw_absorbance[idx] - baseline_points.loc[closest_wv_num, 'absorbance'], 0))
+    return np.array(corrected)
+
+
+def test_baseline_correction_matches_reference_for_both_orders():
+    rng = np.random.default_rng(0)
+    baseline = pd.DataFrame({'wavenumber': np.linspace(1800, 2200, 401), 'absorbance': rng.random(401)})
+    # descending raw spectrum that falls off both ends of the baseline and hits exact midpoints (ties)
+    raw_wavenumber = np.concatenate(([2210.], np.arange(2199.5, 1800., -0.5), [1790.]))
+    raw_absorbance = rng.random(raw_wavenumber.size)
+
+    for baseline_points in (baseline, baseline.iloc[::-1].reset_index(drop=True)):
+        expected = reference_baseline_correction(baseline_points, raw_wavenumber, raw_absorbance)
+        np.testing.assert_array_equal(baseline_correction(baseline_points, raw_wavenumber, raw_absorbance), expected)